@@ -0,0 +1,40 @@
+from supporttracker.events import EventReceiver
+from supporttracker.events import FakeEventEmitter
+from supporttracker.extractor import SupportExtractor
+from supporttracker.templates import platform_ds_request_template_main
+from supporttracker.templates import platform_ds_request_template_thread
+
+
+if __name__ == "__main__":
+
+    # request manager name and the filter of the request messages
+    request_manager_names = ['request manager error']
+    request_filter = "Request -"
+
+    se = SupportExtractor(
+            request_manager_names,
+            request_filter,
+            platform_ds_request_template_main,
+            platform_ds_request_template_thread)
+
+    # print every request as soon as one of its messages arrives
+    receiver = EventReceiver(se, print, port=0)
+    url = receiver.start()
+
+    # post a fake request and its thread replies to the receiver
+    emitter = FakeEventEmitter(url, "C0123456789")
+    parent_ts = emitter.send_message(
+            "request manager error",
+            "Request - Error* <!subteam^S012|@platform-ds> :red_circle: High")
+    emitter.send_message(
+            "request manager error",
+            "*From:* <@U012> :house: *Tenant:* acme :hacker: "
+            "*Code or link to code:* train.py :error: "
+            "*Error logs or link to error logs:* OOM :python: "
+            "*Programming language used:* Python :tensorflow: "
+            "*Specific library used:* tensorflow :speech_balloon: "
+            "*Request:* Training runs out of memory",
+            thread_ts=parent_ts)
+    emitter.send_message("support engineer", "Looking into it.", thread_ts=parent_ts)
+
+    receiver.stop()
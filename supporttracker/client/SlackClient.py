@@ -6,6 +6,8 @@ import pandas as pd
 import slacker
 
 from supporttracker.utils.logging import _log_info
+from supporttracker.utils.utils import build_permalink
+from supporttracker.utils.utils import extract_thread_ts
 from supporttracker.utils.utils import timestamp_string_to_datetime
 
 
@@ -26,7 +28,8 @@ class SlackClient:
     def __init__(self):
         _log_info("Initiating the Slack client.")
         self.client = slacker.Slacker(token=os.environ[self._TOKEN_ENV_VAR])
-        self.client.auth.test()
+        self.team_url = self.client.auth.test().body["url"]
+        self.channel_ids = {}
 
     def get_messages(self, channel_name: str, min_date: datetime, max_date: datetime):
         """
@@ -40,9 +43,9 @@ class SlackClient:
         """
         logging.info(f"Pulling the messages between {min_date} and {max_date} from {channel_name}.")
         messages = self._get_messages(channel_name, min_date, max_date)
-        messages = [self._parse_message(m) for m in messages]
+        messages = [self._parse_message(m, channel_name) for m in messages]
         messages = pd.DataFrame(messages)
-        messages = messages[["date_time", "iid", "username", "permalink", "text"]]
+        messages = messages[["date_time", "ts", "thread_ts", "iid", "username", "permalink", "text"]]
         messages = messages.drop_duplicates(["username", "date_time", "text"])
         logging.info(f"Done pulling the messages.")
         return messages
@@ -55,13 +58,39 @@ class SlackClient:
 
         :return: channel id
         """
+        if channel_name in self.channel_ids:
+            return self.channel_ids[channel_name]
         channel_id = None
-        channel_list = self.client.channels.list().body["channels"]
-        channel_id = [ch["id"] for ch in channel_list if ch["name"] == channel_name]
-        if len(channel_id) > 0:
-            channel_id = channel_id[0]
+        cursor = None
+        while channel_id is None:
+            res = self.client.conversations.list(
+                        cursor=cursor,
+                        types="public_channel,private_channel",
+                        limit=self._MAX_PAGE_SIZE
+                    ).body
+            ids = [ch["id"] for ch in res["channels"] if ch["name"] == channel_name]
+            if len(ids) > 0:
+                channel_id = ids[0]
+            cursor = res.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
+                break
+        self.channel_ids[channel_name] = channel_id
         return channel_id
 
+    def get_permalink(self, channel_id: str, ts: str, thread_ts: str = None):
+        """
+        Build the permalink of a message from the cached team url.
+
+        :param channel_id: id of the channel the message was posted in
+        :param ts: timestamp of the message
+        :param thread_ts: timestamp of the parent message if the message is a thread reply
+
+        :return: permalink of the message, or None if the channel id is unknown
+        """
+        if not isinstance(channel_id, str):
+            return None
+        return build_permalink(self.team_url, channel_id, ts, thread_ts)
+
     def get_user_id(self, user_name):
         """
         Find the user id from the user name.
@@ -169,20 +198,38 @@ class SlackClient:
                 ).body['messages']['matches']
         return res
 
-    def _parse_message(self, message: dict):
+    def _parse_message(self, message: dict, channel_name: str = None):
 
         """
         Extracts and converts the important fields of the message
 
         :param message: message to be parsed
+        :param channel_name: name of the channel, looked up when the message does not carry its id
 
         :return: modified message
         """
-        keys = ["ts", "iid", "username", "permalink", "text"]
-        message = {k: message[k] for k in keys}
-        message["date_time"] = timestamp_string_to_datetime(message["ts"])
-        message["ts"] = None
-        return message
+        parsed = {
+            "ts": message["ts"],
+            "iid": message.get("iid"),
+            "username": message.get("username", message.get("user")),
+            "text": message.get("text", "")
+        }
+        parsed["date_time"] = timestamp_string_to_datetime(parsed["ts"])
+
+        # search results carry the thread only in their permalink
+        thread_ts = message.get("thread_ts")
+        if thread_ts is None and "permalink" in message:
+            thread_ts = extract_thread_ts(message["permalink"])
+        parsed["thread_ts"] = thread_ts if thread_ts is not None else parsed["ts"]
+
+        # search results name their channel, conversations.history does not
+        channel_id = message.get("channel")
+        if isinstance(channel_id, dict):
+            channel_id = channel_id.get("id")
+        if channel_id is None and channel_name is not None:
+            channel_id = self.get_channel_id(channel_name)
+        parsed["permalink"] = self.get_permalink(channel_id, parsed["ts"], parsed["thread_ts"])
+        return parsed
 
 
 
@@ -0,0 +1,310 @@
+from bisect import bisect_left
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import hashlib
+import hmac
+import json
+import logging
+import queue
+import threading
+import time
+
+from supporttracker.extractor import SupportExtractor
+from supporttracker.utils.logging import _log_info
+from supporttracker.utils.utils import build_permalink
+from supporttracker.utils.utils import timestamp_string_to_datetime
+
+
+class EventReceiver:
+    """
+    A receiver for Slack Events API ``message`` events.
+
+    New messages and thread replies are kept in an in-memory thread index and
+    every thread that starts with a support request is parsed again as its
+    replies arrive, so request rows are emitted as soon as Slack delivers the
+    triggering message instead of on the next polling run.
+
+    Rows are handed to ``on_request`` in the order they were built by a single
+    worker thread, after Slack has been acknowledged. A thread leaves the index
+    once its parent is known not to be a request. Request threads keep only the
+    three messages a request row is built from, and stay in the index so that a
+    retried delivery of an earlier reply still produces a corrected row.
+    """
+
+    _MAX_REQUEST_AGE = 300
+    _MAX_THREADS = 10000
+    _IGNORED_SUBTYPES = ["message_changed", "message_deleted", "channel_join", "channel_leave"]
+
+    def __init__(self,
+                 extractor: SupportExtractor,
+                 on_request,
+                 signing_secret: str = None,
+                 team_url: str = None,
+                 host: str = "127.0.0.1",
+                 port: int = 3000):
+        """
+        :param extractor: The extractor used to parse the request threads
+        :param on_request: A callable that receives every new or updated request as a dict
+        :param signing_secret: The Slack app signing secret, requests are not verified if None
+        :param team_url: url of the slack workspace used to build the request links
+        :param host: The host to listen on
+        :param port: The port to listen on, 0 picks a free port
+        """
+        self.extractor = extractor
+        self.on_request = on_request
+        self.signing_secret = signing_secret
+        self.team_url = team_url
+        self.host = host
+        self.port = port
+        self.threads = {}
+        self.closed = OrderedDict()
+        self.rows = queue.Queue()
+        self.lock = threading.Lock()
+        self.server = None
+        self.worker = None
+
+    @property
+    def url(self):
+        """
+        The URL the receiver is listening on.
+        """
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        """
+        Starts listening for events in a background thread.
+
+        :return: The URL the receiver is listening on
+        """
+        self.worker = threading.Thread(target=self._deliver_rows, daemon=True)
+        self.worker.start()
+        handler = type("_Handler", (_EventHandler,), {"receiver": self})
+        self.server = ThreadingHTTPServer((self.host, self.port), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        _log_info(f"Listening for Slack events on {self.url}.")
+        return self.url
+
+    def stop(self):
+        """
+        Stops listening for events, after the pending rows were handed over.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.worker is not None:
+            self.rows.put(None)
+            self.worker.join()
+            self.worker = None
+            _log_info("Stopped listening for Slack events.")
+
+    def handle_payload(self, payload: dict):
+        """
+        Handles one Events API payload.
+
+        :param payload: The decoded JSON body sent by Slack
+
+        :return: A dict to send back to Slack, or None
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("The payload is not a JSON object.")
+        if payload.get("type") == "url_verification":
+            if not isinstance(payload.get("challenge"), str):
+                raise ValueError("The url_verification payload has no challenge.")
+            return {"challenge": payload["challenge"]}
+        if payload.get("type") == "event_callback":
+            event = payload.get("event")
+            if not isinstance(event, dict):
+                raise ValueError("The event_callback payload has no event.")
+            if event.get("type") == "message":
+                self.handle_message(event)
+        return None
+
+    def handle_message(self, event: dict):
+        """
+        Adds a message to the thread index and emits the request of its thread.
+
+        :param event: The ``message`` event
+        """
+        if event.get("hidden") or event.get("subtype") in self._IGNORED_SUBTYPES:
+            return
+        message = self._parse_message(event)
+        key = (message["channel"], message["thread_ts"])
+
+        with self.lock:
+            if key in self.closed:
+                return
+            thread = self.threads.setdefault(key, [])
+            timestamps = [float(m["ts"]) for m in thread]
+            i = bisect_left(timestamps, float(message["ts"]))
+            if i < len(thread) and thread[i]["ts"] == message["ts"]:
+                # Slack retries deliveries that were not acknowledged in time
+                return
+            thread.insert(i, message)
+            self._evict_threads()
+
+            if thread[0]["ts"] != message["thread_ts"]:
+                # the parent has not arrived yet
+                return
+            if not self.extractor.is_request(thread[0]):
+                self._close_thread(key)
+                return
+
+            # replies after the first response do not change the request
+            del thread[3:]
+            if i > 2:
+                return
+            self.rows.put(self.extractor.extract_thread_request(thread))
+
+    def verify(self, body: bytes, timestamp: str, signature: str):
+        """
+        Verifies the signature Slack puts on every request.
+
+        :param body: The raw request body
+        :param timestamp: The ``X-Slack-Request-Timestamp`` header
+        :param signature: The ``X-Slack-Signature`` header
+
+        :return: True if the request was signed with the signing secret
+        """
+        if self.signing_secret is None:
+            return True
+        if timestamp is None or signature is None:
+            return False
+        try:
+            if abs(time.time() - int(timestamp)) > self._MAX_REQUEST_AGE:
+                return False
+        except ValueError:
+            return False
+        expected = sign_request(self.signing_secret, body, timestamp)
+        return hmac.compare_digest(expected, signature)
+
+    def _close_thread(self, key: tuple):
+        """
+        Removes a thread from the index and ignores its later messages.
+
+        :param key: channel id and thread timestamp of the thread
+        """
+        self.threads.pop(key, None)
+        self.closed[key] = True
+        if len(self.closed) > self._MAX_THREADS:
+            self.closed.popitem(last=False)
+
+    def _evict_threads(self):
+        """
+        Removes the oldest threads once the index holds too many threads.
+        """
+        while len(self.threads) > self._MAX_THREADS:
+            self.threads.pop(next(iter(self.threads)))
+
+    def _deliver_rows(self):
+        """
+        Hands the built request rows to the callback, in order, until stopped.
+        """
+        while True:
+            row = self.rows.get()
+            if row is None:
+                return
+            try:
+                self.on_request(row)
+            except Exception:
+                logging.exception("The request callback failed.")
+
+    def _parse_message(self, event: dict):
+        """
+        Extracts and converts the important fields of the message event
+
+        :param event: message event to be parsed
+
+        :return: message
+        """
+        for k in ["ts", "thread_ts", "channel", "text"]:
+            if k in event and not isinstance(event[k], str):
+                raise ValueError(f"The message event field {k} is not a string.")
+        if "ts" not in event:
+            raise ValueError("The message event has no ts.")
+        username = event.get("username")
+        if username is None:
+            bot_profile = event.get("bot_profile")
+            if isinstance(bot_profile, dict):
+                username = bot_profile.get("name")
+        if username is None:
+            username = event.get("user")
+        try:
+            date_time = timestamp_string_to_datetime(event["ts"])
+        except (OverflowError, OSError):
+            raise ValueError(f"The message event ts {event['ts']} is out of range.")
+        message = {
+            "ts": event["ts"],
+            "thread_ts": event.get("thread_ts", event["ts"]),
+            "channel": event.get("channel"),
+            "username": username,
+            "text": event.get("text", ""),
+            "date_time": date_time,
+            "permalink": None
+        }
+        if self.team_url is not None and message["channel"] is not None:
+            message["permalink"] = build_permalink(
+                        self.team_url,
+                        message["channel"],
+                        message["ts"],
+                        message["thread_ts"]
+                    )
+        return message
+
+
+class _EventHandler(BaseHTTPRequestHandler):
+    """
+    Passes the requests sent by Slack to an EventReceiver.
+    """
+
+    receiver = None
+
+    def do_POST(self):
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self._respond(400, None)
+            return
+        body = self.rfile.read(length)
+        if not self.receiver.verify(body,
+                                    self.headers.get("X-Slack-Request-Timestamp"),
+                                    self.headers.get("X-Slack-Signature")):
+            self._respond(401, None)
+            return
+        try:
+            response = self.receiver.handle_payload(json.loads(body))
+        except ValueError as e:
+            logging.debug(f"Rejected a Slack event: {e}")
+            self._respond(400, None)
+            return
+        self._respond(200, response)
+
+    def log_message(self, format, *args):
+        logging.debug(format % args)
+
+    def _respond(self, status: int, response: dict):
+        body = b"" if response is None else json.dumps(response).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def sign_request(signing_secret: str, body: bytes, timestamp: str):
+    """
+    Computes the signature Slack sends in the ``X-Slack-Signature`` header.
+
+    :param signing_secret: The Slack app signing secret
+    :param body: The raw request body
+    :param timestamp: The request timestamp
+
+    :return: The signature string
+    """
+    base = b"v0:" + str(timestamp).encode() + b":" + body
+    digest = hmac.new(signing_secret.encode(), base, hashlib.sha256).hexdigest()
+    return f"v0={digest}"
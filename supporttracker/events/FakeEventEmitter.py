@@ -0,0 +1,66 @@
+import json
+import time
+from urllib.request import Request
+from urllib.request import urlopen
+
+from supporttracker.events.EventReceiver import sign_request
+
+
+class FakeEventEmitter:
+    """
+    Sends Slack Events API ``message`` events to a receiver, for local testing
+    without a Slack app.
+    """
+
+    def __init__(self, url: str, channel_id: str, signing_secret: str = None):
+        """
+        :param url: URL of the event receiver
+        :param channel_id: id of the channel the messages are posted in
+        :param signing_secret: secret used to sign the events, events are unsigned if None
+        """
+        self.url = url
+        self.channel_id = channel_id
+        self.signing_secret = signing_secret
+
+    def send_message(self, username: str, text: str, thread_ts: str = None, ts: str = None):
+        """
+        Posts a message event to the receiver.
+
+        :param username: name of the user or workflow posting the message
+        :param text: text of the message
+        :param thread_ts: timestamp of the parent message for thread replies
+        :param ts: timestamp of the message, the current time if None
+
+        :return: timestamp of the message
+        """
+        if ts is None:
+            ts = f"{time.time():.6f}"
+        event = {
+            "type": "message",
+            "channel": self.channel_id,
+            "username": username,
+            "text": text,
+            "ts": ts
+        }
+        if thread_ts is not None:
+            event["thread_ts"] = thread_ts
+        self.send_payload({"type": "event_callback", "event": event})
+        return ts
+
+    def send_payload(self, payload: dict):
+        """
+        Posts a raw Events API payload to the receiver.
+
+        :param payload: payload to be sent
+
+        :return: the decoded response body, or None if it was empty
+        """
+        body = json.dumps(payload).encode()
+        headers = {"Content-Type": "application/json"}
+        if self.signing_secret is not None:
+            timestamp = str(int(time.time()))
+            headers["X-Slack-Request-Timestamp"] = timestamp
+            headers["X-Slack-Signature"] = sign_request(self.signing_secret, body, timestamp)
+        with urlopen(Request(self.url, data=body, headers=headers)) as res:
+            response = res.read()
+        return json.loads(response) if response else None
@@ -0,0 +1,2 @@
+from .EventReceiver import EventReceiver
+from .FakeEventEmitter import FakeEventEmitter
\ No newline at end of file
@@ -1,3 +1,5 @@
+import re
+
 import pandas as pd
 
 from supporttracker.client import SlackClient
@@ -26,56 +28,74 @@ class SupportExtractor:
         :param messages: A dataframe of all messages to be analyzed
         :retrun: A dataframe analyzed and ready to be pushed to support track sheet
         """
+        messages = self._normalize_timestamps(messages)
         req_messages = messages[messages["username"].isin(self.request_manager_names)]
         req_messages = req_messages[req_messages["text"].str.contains(self.request_filter)]
 
         _log_info("Extracting the support requests.")
-        columns = ["date_time", "link", "response_date", "resolved_date"]
-        columns.extend(self.request_template_main.keys())
-        columns.extend(self.request_template_thread.keys())
-        main_df = pd.DataFrame(columns=columns)
-        i = 0
-        for _, msg in req_messages.iterrows():
+        columns = self._columns()
+        threads = self._group_threads(messages)
+        rows = []
+        for i, msg in enumerate(req_messages.to_dict("records")):
             _log_info(f"Extracting support request #{i}.")
-            df = pd.DataFrame({k: [None] for k in columns})
+            thread = threads.get(self._thread_key(msg), [msg])
 
-            # request main message
-            parsed = self._parse_request(msg, self.request_template_main)
-            df = self._update_datafram(df, parsed)
+            # requests can be posted as a reply in another thread
+            thread = thread[self._thread_position(thread, msg):]
+            rows.append(self.extract_thread_request(thread))
+        main_df = pd.DataFrame(rows, columns=columns)
 
-            # request thread message
-            first_response = self._find_nth_response(msg, messages, 1)
-            if first_response is not None:
-                parsed = self._parse_request(first_response, self.request_template_thread)
-                df = self._update_datafram(df, parsed)
+        _log_info("Done extracting the support requests.")
+        return(main_df)
+
+    def is_request(self, message: dict):
+        """
+        Checks whether a message is the main message of a support request.
 
-            # first non-request reply in the thread
-            second_response = self._find_nth_response(msg, messages, 2)
-            if second_response is not None:
-                df["response_date"] = second_response["date_time"]
+        :param message: A message with its username and text
 
-            # meta data
-            df["date_time"] = msg["date_time"]
-            df["link"] = msg["permalink"]
-            df["resolved_date"] = None
+        :retrun: True if the message was posted by a request manager and matches the filter
+        """
+        return (message["username"] in self.request_manager_names
+                and re.search(self.request_filter, message["text"]) is not None)
 
-            main_df = pd.concat([main_df, df])
-            i = i + 1
+    def extract_thread_request(self, thread_messages: list):
+        """
+        Extracts a support request from the messages of a single thread.
 
-        _log_info("Done extracting the support requests.")
-        return(main_df)
+        :param thread_messages: A list of the thread messages sorted by time, main message first
 
-    def _update_datafram(self, df: pd.DataFrame, updates: dict):
+        :retrun: A dict of the request fields
         """
-        Updates a dataframe based on a dictornary.
-        :param df: Pandas dataframe to be updated
-        :param updates: fields and their new values
+        msg = thread_messages[0]
+        res = {k: None for k in self._columns()}
 
-        :retrun: Update dataframe
+        # request main message
+        res.update(self._parse_request(msg, self.request_template_main))
+
+        # request thread message
+        if len(thread_messages) > 1:
+            res.update(self._parse_request(thread_messages[1], self.request_template_thread))
+
+        # first non-request reply in the thread
+        if len(thread_messages) > 2:
+            res["response_date"] = thread_messages[2]["date_time"]
+
+        # meta data
+        res["date_time"] = msg["date_time"]
+        res["link"] = msg.get("permalink")
+        return res
+
+    def _columns(self):
+        """
+        Lists the columns of the extracted requests.
+
+        :retrun: A list of column names
         """
-        for k in updates.keys():
-            df[k] = updates[k]
-        return df
+        columns = ["date_time", "link", "response_date", "resolved_date"]
+        columns.extend(self.request_template_main.keys())
+        columns.extend(self.request_template_thread.keys())
+        return columns
 
     def _parse_request(self, message: pd.Series, template: dict):
         """
@@ -97,33 +117,80 @@ class SupportExtractor:
                     )
         return res
 
-    def _find_nth_response(self, message: pd.Series, messages: pd.DataFrame, n: int):
+    def _group_threads(self, messages: pd.DataFrame):
         """
-        Finds the nth message that was replied to the message in its thread
+        Groups the messages by the thread they belong to.
 
-        :param message: A message to be used as the initiation of conversation
         :param messages: A dataframe of all messages to be analyzed
-        :param n: To return the n th message
 
-        :retrun: A message that is the nth message response in the thread
+        :retrun: A dict of thread keys and their messages sorted by time
         """
-        nth_message = None
-        if "thread" in message["permalink"]:
-            timestamps = [extract_thread_ts(m) for m in messages["permalink"]]
-            timestamp = extract_thread_ts(message["permalink"])
-            indexes = [t == timestamp for t in timestamps]
-            thread_messages = messages[indexes]
-            thread_messages = thread_messages.sort_values("date_time", ascending = True)
-            if thread_messages.shape[0] > n:
-                nth_message = thread_messages.iloc[n, :]
-        return nth_message
+        threads = {}
+        for m in messages.to_dict("records"):
+            threads.setdefault(self._thread_key(m), []).append(m)
+        for thread in threads.values():
+            thread.sort(key=lambda m: (m["date_time"], float(m.get("ts") or 0)))
+        return threads
+
+    def _normalize_timestamps(self, messages: pd.DataFrame):
+        """
+        Converts the ts and thread_ts columns to slack timestamp strings.
 
+        :param messages: A dataframe of messages, possibly read back from a csv file
 
+        :retrun: A copy of the dataframe with string timestamps
+        """
+        messages = messages.copy()
+        for k in ["ts", "thread_ts"]:
+            if k in messages.columns:
+                messages[k] = messages[k].map(self._timestamp_string).astype(object)
+        return messages
 
+    def _timestamp_string(self, ts):
+        """
+        Formats a timestamp the way slack does (e.g, 1572900000.001200).
 
+        :param ts: A timestamp string or number
 
+        :retrun: The timestamp string, or None if it is missing
+        """
+        if isinstance(ts, str):
+            return ts
+        if ts is None or pd.isna(ts):
+            return None
+        return f"{float(ts):.6f}"
 
+    def _thread_position(self, thread: list, message: dict):
+        """
+        Finds the position of a message in its thread.
 
+        :param thread: A list of the thread messages sorted by time
+        :param message: A message of the thread
 
+        :retrun: The index of the message in the thread
+        """
+        keys = ["username", "date_time", "text"]
+        for i, m in enumerate(thread):
+            if all(m.get(k) == message.get(k) for k in keys):
+                return i
+        return 0
 
+    def _thread_key(self, message: dict):
+        """
+        Finds the key of the thread a message belongs to.
+
+        :param message: A message with its ts and thread_ts, or only its permalink
 
+        :retrun: The timestamp of the thread parent message
+        """
+        if "ts" in message or "thread_ts" in message:
+            for k in ["thread_ts", "ts"]:
+                if isinstance(message.get(k), str):
+                    return message[k]
+            raise ValueError(f"The message at {message.get('date_time')} has neither a ts nor a thread_ts.")
+
+        # messages exported before ts and thread_ts were kept
+        thread_ts = extract_thread_ts(message["permalink"])
+        if thread_ts is None:
+            return message["permalink"]
+        return thread_ts
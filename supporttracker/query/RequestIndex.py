@@ -0,0 +1,177 @@
+from datetime import datetime
+import re
+
+import numpy as np
+import pandas as pd
+
+from supporttracker.utils.logging import _log_info
+
+
+class RequestIndex:
+    """
+    An in-memory index over the support requests returned by the extractor.
+
+    Keyword queries are answered from an inverted token index built on the
+    free text fields, and filters are answered from a sorted index on the
+    request date and exact match indexes on the metadata fields, so no query
+    has to scan every row.
+    """
+
+    _TEXT_FIELDS = ["request", "log", "code"]
+    _DATE_FIELD = "date_time"
+    _EXACT_FIELDS = ["category", "tenant", "user"]
+    _TOKEN_PATTERN = r"\w+"
+
+    def __init__(self, requests: pd.DataFrame = None):
+        self.requests = pd.DataFrame()
+        self.pending = []
+        self.size = 0
+        self.tokens = {}
+        self.values = {f: {} for f in self._EXACT_FIELDS}
+        self.date_keys = np.array([], dtype="datetime64[ns]")
+        self.date_ids = np.array([], dtype=np.int64)
+        if requests is not None:
+            self.add_requests(requests)
+
+    def __len__(self):
+        return self.size
+
+    def add_requests(self, requests: pd.DataFrame):
+        """
+        Appends new requests to the index, updating it incrementally.
+
+        :param requests: A dataframe of requests as returned by the extractor,
+            or as read back from an exported csv file
+        """
+        _log_info(f"Indexing {requests.shape[0]} support requests.")
+        requests = self._normalize(requests)
+        requests.index = pd.RangeIndex(self.size, self.size + requests.shape[0])
+        self.size += requests.shape[0]
+
+        # the stored rows are only concatenated when a query needs them
+        self.pending.append(requests)
+
+        for f in self._TEXT_FIELDS:
+            if f in requests.columns:
+                text = requests[f][requests[f].map(lambda v: isinstance(v, str))]
+                if text.empty:
+                    continue
+                tokens = text.str.lower().str.findall(self._TOKEN_PATTERN).explode().dropna()
+                self._add_postings(self.tokens, tokens)
+
+        for f in self._EXACT_FIELDS:
+            if f in requests.columns:
+                self._add_postings(self.values[f], requests[f].dropna())
+
+        # merge the sorted new dates into the sorted index
+        if self._DATE_FIELD in requests.columns:
+            dates = requests[self._DATE_FIELD].dropna()
+            keys = dates.values.astype("datetime64[ns]")
+            order = np.argsort(keys, kind="stable")
+            keys = keys[order]
+            ids = dates.index.values.astype(np.int64)[order]
+            positions = np.searchsorted(self.date_keys, keys, "right")
+            self.date_keys = np.insert(self.date_keys, positions, keys)
+            self.date_ids = np.insert(self.date_ids, positions, ids)
+
+    def query(self,
+              keywords: str = None,
+              category: str = None,
+              tenant: str = None,
+              user: str = None,
+              min_date: datetime = None,
+              max_date: datetime = None):
+        """
+        Finds the requests that match all of the given conditions.
+
+        :param keywords: words that all have to appear in the request, log or code
+        :param category: category of the request
+        :param tenant: tenant of the request
+        :param user: user who made the request
+        :param min_date: minimum date of the request
+        :param max_date: maximum date of the request (exclusive)
+
+        :return: A dataframe of the matching requests sorted by date
+        """
+        candidates = []
+        if keywords is not None:
+            tokens = set(re.findall(self._TOKEN_PATTERN, keywords.lower()))
+            if not tokens:
+                return self._stored_requests().iloc[:0]
+            for token in tokens:
+                candidates.append(self.tokens.get(token, set()))
+        for field, value in [("category", category), ("tenant", tenant), ("user", user)]:
+            if value is not None:
+                candidates.append(self.values[field].get(str(value), set()))
+        if min_date is not None or max_date is not None:
+            candidates.append(self._lookup_dates(min_date, max_date))
+
+        if candidates:
+            candidates.sort(key=len)
+            ids = set.intersection(*candidates)
+        else:
+            ids = range(len(self))
+
+        res = self._stored_requests().loc[sorted(ids)]
+        if self._DATE_FIELD in res.columns:
+            res = res.sort_values(self._DATE_FIELD, kind="stable", na_position="last")
+        return res.reset_index(drop=True)
+
+    def _stored_requests(self):
+        """
+        Concatenates the requests added since the last query to the stored ones.
+
+        :return: A dataframe of all indexed requests, indexed by row id
+        """
+        if self.pending:
+            frames = [self.requests] if self.requests.shape[0] else []
+            self.requests = pd.concat(frames + self.pending)
+            self.pending = []
+        return self.requests
+
+    def _normalize(self, requests: pd.DataFrame):
+        """
+        Converts the indexed fields to comparable types.
+
+        :param requests: A dataframe of requests
+
+        :return: A copy of the dataframe with datetime dates and string metadata
+        """
+        requests = requests.copy()
+        if self._DATE_FIELD in requests.columns:
+            requests[self._DATE_FIELD] = pd.to_datetime(requests[self._DATE_FIELD], errors="coerce")
+        for f in self._EXACT_FIELDS:
+            if f in requests.columns:
+                requests[f] = requests[f].map(lambda v: v if isinstance(v, str) or pd.isna(v) else str(v))
+        return requests
+
+    def _add_postings(self, index: dict, values: pd.Series):
+        """
+        Adds the row ids of each value to an index.
+
+        :param index: A dict of values and the set of row ids having them
+        :param values: A series of values indexed by row id
+        """
+        codes, uniques = pd.factorize(values)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.cumsum(np.bincount(codes, minlength=len(uniques)))[:-1]
+        groups = np.split(values.index.values[order], bounds)
+        for value, ids in zip(uniques, groups):
+            index.setdefault(value, set()).update(ids.tolist())
+
+    def _lookup_dates(self, min_date, max_date):
+        """
+        Finds the rows whose date lies between two bounds.
+
+        :param min_date: lower bound, or None for no lower bound
+        :param max_date: upper bound (exclusive), or None for no upper bound
+
+        :return: A set of row ids
+        """
+        start = 0
+        end = len(self.date_keys)
+        if min_date is not None:
+            start = np.searchsorted(self.date_keys, pd.Timestamp(min_date).to_datetime64(), "left")
+        if max_date is not None:
+            end = np.searchsorted(self.date_keys, pd.Timestamp(max_date).to_datetime64(), "left")
+        return set(self.date_ids[start:end].tolist())
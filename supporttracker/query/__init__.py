@@ -0,0 +1 @@
+from .RequestIndex import RequestIndex
\ No newline at end of file
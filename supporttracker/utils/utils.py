@@ -1,5 +1,7 @@
 from datetime import datetime
 import re
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
 
 
 
@@ -29,12 +31,30 @@ def extract_thread_ts(link):
 
     :return: return the thread timestamp string
     """
-    if "thread" in link:
-        return link[-16:]
+    thread_ts = parse_qs(urlparse(link).query).get("thread_ts")
+    if thread_ts:
+        return thread_ts[0]
     else:
         return None
 
 
+def build_permalink(team_url: str, channel_id: str, ts: str, thread_ts: str = None):
+    """
+    Build the permalink of a message without calling chat.getPermalink
+
+    :param team_url: url of the slack workspace (e.g, https://team.slack.com/)
+    :param channel_id: id of the channel the message was posted in
+    :param ts: timestamp of the message
+    :param thread_ts: timestamp of the parent message if the message is a thread reply
+
+    :return: return the permalink of the message
+    """
+    link = f"{team_url.rstrip('/')}/archives/{channel_id}/p{ts.replace('.', '')}"
+    if thread_ts is not None and thread_ts != ts:
+        link = f"{link}?thread_ts={thread_ts}&cid={channel_id}"
+    return link
+
+
 def extract_user_id(user_id):
     """
     Get the user id exracted from a bad format (e.g, 123 from <@123>)